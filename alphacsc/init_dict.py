@@ -326,7 +326,7 @@ def get_max_error_dict(X, z, D, uv_constraint='separate', window=False):
     ----------
     X: array, shape (n_trials, n_channels, n_times)
         Signals encoded in the CSC.
-    z: array, shape (n_atoms, n_trials, n_times_valid)
+    z: array, shape (n_trials, n_atoms, n_times_valid)
         Current estimate of the coding signals.
     D: array, shape (n_atoms, n_channels + n_times_atom)
         Current estimate of the rank1 multivariate dictionary.
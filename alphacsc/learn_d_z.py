@@ -173,7 +173,7 @@ def learn_d_z(X, n_atoms, n_times_atom, func_d=update_d_block, reg=0.1,
                 print('[seed %s] Objective (z_hat) : %0.8f' % (random_state,
                                                                pobj[-1]))
 
-            if len(z_hat.nonzero()[0]) == 0:
+            if not z_hat.any():
                 import warnings
                 warnings.warn("Regularization parameter `reg` is too large "
                               "and all the activations are zero. No atoms has"
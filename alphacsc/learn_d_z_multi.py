@@ -22,6 +22,11 @@ from .update_z_multi import update_z_multi
 from .update_d_multi import update_uv, update_d
 
 
+# Maximal number of consecutive iterations without evaluating the objective,
+# when using d_change_tol in the batch algorithms.
+MAX_SKIPPED_OBJECTIVE = 10
+
+
 def learn_d_z_multi(X, n_atoms, n_times_atom, n_iter=60, n_jobs=1,
                     lmbd_max='fixed', reg=0.1, loss='l2',
                     loss_params=dict(gamma=.1, sakoe_chiba_band=10, ordar=10),
@@ -95,6 +100,17 @@ def learn_d_z_multi(X, n_atoms, n_times_atom, n_iter=60, n_jobs=1,
             the successive estimates. But it also increases the computational
             cost as more coding signals z_hat must be estimate at each
             iteration.
+          d_change_tol : float or None
+            For batch and greedy learning. If not None, the objective is only
+            evaluated, and the convergence checked, when the relative change
+            of D_hat in the previous iteration is smaller than d_change_tol,
+            or after MAX_SKIPPED_OBJECTIVE iterations without evaluation.
+            pobj then has fewer values, and the times of the skipped
+            iterations are accounted in the next evaluated ones. The
+            callback is also only called on the evaluated iterations. On the
+            first evaluated iteration after skipped ones, the previous cost is
+            several iterations old, so neither the convergence nor
+            raise_on_increase are checked.
     solver_z : str
         The solver to use for the z update. Options are
         'l-bfgs' (default) | "lgcd"
@@ -120,7 +136,8 @@ def learn_d_z_multi(X, n_atoms, n_times_atom, n_iter=60, n_jobs=1,
         The verbosity level.
     callback : func
         A callback function called at the end of each loop of the
-        coordinate descent.
+        coordinate descent, except the loops where the objective is skipped
+        with algorithm_params['d_change_tol'].
     random_state : int | None
         The random state.
     raise_on_increase : boolean
@@ -136,6 +153,9 @@ def learn_d_z_multi(X, n_atoms, n_times_atom, n_iter=60, n_jobs=1,
         The objective function value at each step of the coordinate descent.
     times : list
         The cumulative time for each iteration of the coordinate descent.
+        For the batch and greedy algorithms, the time of the z updates
+        includes the reconstruction of X_hat in the parallel jobs, which is
+        reused to monitor the cost function.
     uv_hat : array, shape (n_atoms, n_channels + n_times_atom)
         The atoms to learn from the data.
     z_hat : array, shape (n_trials, n_atoms, n_times_valid)
@@ -182,19 +202,24 @@ def learn_d_z_multi(X, n_atoms, n_times_atom, n_iter=60, n_jobs=1,
     if lmbd_max == "scaled":
         reg = reg * _lmbd_max
 
-    def compute_z_func(X, z_hat, D_hat, reg=None):
+    def compute_z_func(X, z_hat, D_hat, reg=None, return_X_hat=False,
+                       return_z_sum=False):
         return update_z_multi(X, D_hat, reg=reg, z0=z_hat,
                               solver=solver_z, solver_kwargs=z_kwargs,
                               loss=loss, loss_params=loss_params,
-                              n_jobs=n_jobs, return_ztz=True)
+                              n_jobs=n_jobs, return_ztz=True,
+                              return_X_hat=return_X_hat,
+                              return_z_sum=return_z_sum)
 
-    def obj_func(X, z_hat, D_hat, reg=None, return_X_hat=False):
+    def obj_func(X, z_hat, D_hat, reg=None, return_X_hat=False, X_hat=None,
+                 z_sum=None):
         return compute_X_and_objective_multi(X, z_hat, D_hat,
                                              reg=reg, loss=loss,
                                              loss_params=loss_params,
                                              uv_constraint=uv_constraint,
                                              feasible_evaluation=True,
-                                             return_X_hat=return_X_hat)
+                                             return_X_hat=return_X_hat,
+                                             X_hat=X_hat, z_sum=z_sum)
 
     d_kwargs = dict(verbose=verbose, eps=1e-8)
     d_kwargs.update(solver_d_kwargs)
@@ -279,7 +304,7 @@ def _batch_learn(X, D_hat, z_hat, compute_z_func, compute_d_func,
                  obj_func, end_iter_func, n_iter=100,
                  lmbd_max='fixed', reg=None, verbose=0, greedy=False,
                  random_state=None, name="batch", uv_constraint='separate',
-                 window=False):
+                 window=False, d_change_tol=None):
     reg_ = reg
 
     # Initialize constants dictionary
@@ -306,6 +331,10 @@ def _batch_learn(X, D_hat, z_hat, compute_z_func, compute_d_func,
     times = [0]
     pobj = [obj_func(X, z_hat, D_hat, reg=reg_)]
 
+    # relative change of D_hat in the last iteration, used to skip the
+    # evaluation of the objective far from the convergence
+    d_change, n_skipped, time_skipped = np.inf, 0, 0
+
     for ii in range(n_iter):  # outer loop of coordinate descent
         if verbose == 1:
             msg = '.' if ((ii + 1) % 50 != 0) else '+\n'
@@ -330,20 +359,43 @@ def _batch_learn(X, D_hat, z_hat, compute_z_func, compute_d_func,
         if verbose > 5:
             print('[{}] lambda = {:.3e}'.format(name, np.mean(reg_)))
 
+        # The objective is not evaluated while D_hat changes a lot, as the
+        # algorithm cannot have converged yet. The times of the skipped
+        # steps are added to the next monitored step.
+        evaluate = (d_change_tol is None or d_change < d_change_tol or
+                    n_skipped >= MAX_SKIPPED_OBJECTIVE or ii == n_iter - 1)
+        # after skipped iterations, pobj[-3] is the cost of an older
+        # iteration and does not give the decrease of this z update
+        after_skip = n_skipped > 0
+
         # Compute z update
         start = time.time()
-        z_hat, constants['ztz'], constants['ztX'] = compute_z_func(
-            X, z_hat, D_hat, reg=reg_)
-
-        # monitor cost function
-        times.append(time.time() - start)
-        pobj.append(obj_func(X, z_hat, D_hat, reg=reg_))
+        if evaluate:
+            z_hat, constants['ztz'], constants['ztX'], X_hat, z_sum = \
+                compute_z_func(X, z_hat, D_hat, reg=reg_, return_X_hat=True,
+                               return_z_sum=True)
+
+            # monitor cost function, reusing the X_hat and the sum of z_hat
+            # computed with the z update. This value is always needed, as
+            # end_iter_func uses the decrease of the cost after the z update
+            # to check the convergence. Note that the time of the z update
+            # thus includes the reconstruction of X_hat.
+            times.append(time.time() - start + time_skipped)
+            pobj.append(obj_func(X, z_hat, D_hat, reg=reg_, X_hat=X_hat,
+                                 z_sum=z_sum))
+            n_skipped, time_skipped = 0, 0
+        else:
+            z_hat, constants['ztz'], constants['ztX'] = compute_z_func(
+                X, z_hat, D_hat, reg=reg_)
+            time_skipped += time.time() - start
+            n_skipped += 1
 
         z_nnz, z_size = lil.get_nnz_and_size(z_hat)
         if verbose > 5:
             print("[{}] sparsity: {:.3e}".format(
                 name, z_nnz.sum() / z_size))
-            print('[{}] Objective (z) : {:.3e}'.format(name, pobj[-1]))
+            if evaluate:
+                print('[{}] Objective (z) : {:.3e}'.format(name, pobj[-1]))
 
         if np.all(z_nnz == 0):
             import warnings
@@ -354,11 +406,20 @@ def _batch_learn(X, D_hat, z_hat, compute_z_func, compute_d_func,
 
         # Compute D update
         start = time.time()
+        D_hat_prev = D_hat
         D_hat = compute_d_func(X, z_hat, D_hat, constants)
 
-        # monitor cost function
-        times.append(time.time() - start)
-        pobj.append(obj_func(X, z_hat, D_hat, reg=reg_))
+        if evaluate:
+            # monitor cost function, z_hat is unchanged so z_sum is still
+            # valid
+            times.append(time.time() - start)
+            pobj.append(obj_func(X, z_hat, D_hat, reg=reg_, z_sum=z_sum))
+        else:
+            time_skipped += time.time() - start
+
+        if d_change_tol is not None:
+            d_change = (np.linalg.norm(D_hat - D_hat_prev) /
+                        np.linalg.norm(D_hat_prev))
 
         null_atom_indices = np.where(z_nnz == 0)[0]
         if len(null_atom_indices) > 0:
@@ -368,11 +429,14 @@ def _batch_learn(X, D_hat, z_hat, compute_z_func, compute_d_func,
             if verbose > 5:
                 print('[{}] Resampled atom {}'.format(name, k0))
 
-        if verbose > 5:
-            print('[{}] Objective (d) : {:.3e}'.format(name, pobj[-1]))
+        if evaluate:
+            if verbose > 5:
+                print('[{}] Objective (d) : {:.3e}'.format(name, pobj[-1]))
 
-        if end_iter_func(X, z_hat, D_hat, pobj, ii):
-            break
+            # this also calls the callback, which is thus skipped with pobj
+            if end_iter_func(X, z_hat, D_hat, pobj, ii,
+                             check_decrease=not after_skip):
+                break
 
     return pobj, times, D_hat, z_hat
 
@@ -401,6 +465,8 @@ def _online_learn(X, D_hat, z_hat, compute_z_func, compute_d_func,
     # monitor cost function
     times = [0]
     pobj = [obj_func(X, z_hat, D_hat, reg=reg_)]
+    # sum of z_hat, updated with the mini-batches to compute the objective
+    z_sum = lil.safe_sum(z_hat, axis=(0, 2))
 
     for ii in range(n_iter):  # outer loop of coordinate descent
         if verbose == 1:
@@ -430,14 +496,19 @@ def _online_learn(X, D_hat, z_hat, compute_z_func, compute_d_func,
             raise NotImplementedError(
                 "the '{}' batch_selection strategy for the online learning is "
                 "not implemented.".format(batch_selection))
-        z_hat[i0], ztz, ztX = compute_z_func(X[i0], z_hat[i0], D_hat, reg=reg_)
+        z_sum -= lil.safe_sum(z_hat[i0], axis=(0, 2))
+        z_hat[i0], ztz, ztX, z_sum_i0 = compute_z_func(
+            X[i0], z_hat[i0], D_hat, reg=reg_, return_z_sum=True)
+        z_sum += z_sum_i0
 
         constants['ztz'] = alpha * constants['ztz'] + ztz
         constants['ztX'] = alpha * constants['ztX'] + ztX
 
-        # monitor cost function
+        # monitor cost function. This value is always needed, as
+        # end_iter_func uses the decrease of the cost after the z update to
+        # check the convergence.
         times.append(time.time() - start)
-        pobj.append(obj_func(X, z_hat, D_hat, reg=reg_))
+        pobj.append(obj_func(X, z_hat, D_hat, reg=reg_, z_sum=z_sum))
 
         z_nnz, z_size = lil.get_nnz_and_size(z_hat)
         if verbose > 5:
@@ -456,9 +527,9 @@ def _online_learn(X, D_hat, z_hat, compute_z_func, compute_d_func,
         start = time.time()
         D_hat = compute_d_func(X, z_hat, D_hat, constants)
 
-        # monitor cost function
+        # monitor cost function, z_hat is unchanged so z_sum is still valid
         times.append(time.time() - start)
-        pobj.append(obj_func(X, z_hat, D_hat, reg=reg_))
+        pobj.append(obj_func(X, z_hat, D_hat, reg=reg_, z_sum=z_sum))
 
         null_atom_indices = np.where(z_nnz == 0)[0]
         if len(null_atom_indices) > 0:
@@ -479,7 +550,10 @@ def _online_learn(X, D_hat, z_hat, compute_z_func, compute_d_func,
 
 def get_iteration_func(eps, stopping_pobj, callback, lmbd_max, name, verbose,
                        raise_on_increase):
-    def end_iteration(X, z_hat, D_hat, pobj, iteration):
+    def end_iteration(X, z_hat, D_hat, pobj, iteration, check_decrease=True):
+        # check_decrease is False when pobj[-3] is not the cost before the
+        # last z update. Then, neither the convergence nor the increase of the
+        # cost can be checked with dz and du.
         if callable(callback):
             callback(X, D_hat, z_hat, pobj)
 
@@ -487,7 +561,8 @@ def get_iteration_func(eps, stopping_pobj, callback, lmbd_max, name, verbose,
         # parameter is fixed.
         dz = (pobj[-3] - pobj[-2]) / min(pobj[-3], pobj[-2])
         du = (pobj[-2] - pobj[-1]) / min(pobj[-2], pobj[-1])
-        if ((dz < eps or du < eps) and lmbd_max in ['fixed', 'scaled']):
+        if (check_decrease and (dz < eps or du < eps) and
+                lmbd_max in ['fixed', 'scaled']):
             if dz < 0 and raise_on_increase:
                 raise RuntimeError(
                     "The z update have increased the objective value by {}."
@@ -18,6 +18,9 @@ try:
 except ImportError:
     _sdtw = None
 
+# Number of points of the residual computed at once in the l2 objective
+L2_BLOCK_SIZE = 2 ** 16
+
 
 def _assert_dtw():
     if _sdtw is None:
@@ -27,7 +30,8 @@ def _assert_dtw():
 
 
 def compute_objective(X=None, X_hat=None, z_hat=None, D=None,
-                      constants=None, reg=None, loss='l2', loss_params=dict()):
+                      constants=None, reg=None, loss='l2', loss_params=dict(),
+                      z_sum=None):
     """Compute the value of the objective function
 
     Parameters
@@ -36,19 +40,22 @@ def compute_objective(X=None, X_hat=None, z_hat=None, D=None,
         The data on which to perform CSC.
     X_hat : array, shape (n_trials, n_channels, n_times)
         The current reconstructed signal.
-    z_hat : array, shape (n_atoms, n_trials, n_times_valid)
+    z_hat : array, shape (n_trials, n_atoms, n_times_valid)
         Can also be a list of n_trials LIL-sparse matrix of shape
             (n_atoms, n_times - n_times_atom + 1)
         The current activation signals for the regularization.
     constants : dict
         Constant to accelerate the computation when updating uv.
-    reg : float or array, shape (n_atoms, )
+    reg : float or array, shape (n_atoms, ) or (n_atoms, 1)
         The regularization parameters. If None, no regularization is added.
         The regularization constant
     loss : str in {'l2' | 'dtw'}
         Loss function for the data-fit
     loss_params : dict
         Parameter for the loss
+    z_sum : array, shape (n_atoms, ) or None
+        The sum of z_hat over the trials and the times, if already computed.
+        It is used instead of z_hat for the regularization.
     """
     if loss == 'l2':
         obj = _l2_objective(X=X, X_hat=X_hat, D=D, constants=constants)
@@ -66,17 +73,18 @@ def compute_objective(X=None, X_hat=None, z_hat=None, D=None,
         raise NotImplementedError("loss '{}' is not implemented".format(loss))
 
     if reg is not None:
-        if isinstance(reg, (int, float)):
-            obj += reg * safe_sum(z_hat)
-        else:
-            obj += np.sum(reg * safe_sum(z_hat, axis=(1, 2)))
+        if z_sum is None:
+            z_sum = safe_sum(z_hat, axis=(0, 2))
+        # ravel reg as the per atom regularization can be (n_atoms, 1)
+        obj += np.sum(np.ravel(reg) * z_sum)
 
     return obj
 
 
 def compute_X_and_objective_multi(X, z_hat, D_hat=None, reg=None, loss='l2',
                                   loss_params=dict(), feasible_evaluation=True,
-                                  uv_constraint='joint', return_X_hat=False):
+                                  uv_constraint='joint', return_X_hat=False,
+                                  X_hat=None, z_sum=None):
     """Compute X and return the value of the objective function
 
     Parameters
@@ -97,34 +105,60 @@ def compute_X_and_objective_multi(X, z_hat, D_hat=None, reg=None, loss='l2',
         Parameters of the loss
     feasible_evaluation: boolean
         If feasible_evaluation is True, it first projects on the feasible set,
-        i.e. norm(uv_hat) <= 1.
+        i.e. norm(uv_hat) <= 1. The projection, and the copies of z_hat and
+        uv_hat it requires, are skipped if uv_hat is already feasible.
     uv_constraint : str in {'joint', 'separate'}
         The kind of norm constraint on the atoms:
         If 'joint', the constraint is norm([u, v]) <= 1
         If 'separate', the constraint is norm(u) <= 1 and norm(v) <= 1
+    return_X_hat : boolean
+        If True, also returns the reconstructed signal X_hat.
+    X_hat : array, shape (n_trials, n_channels, n_times) or None
+        The reconstructed signal for z_hat and D_hat, if already computed. It
+        is reused directly when D_hat is feasible, or when the feasible
+        projection rescales z_hat and D_hat in opposite ways, i.e. for
+        full-rank D_hat and uv_constraint='separate'. With 'joint', the
+        projection of uv_hat changes X_hat, which is then recomputed.
+    z_sum : array, shape (n_atoms, ) or None
+        The sum of z_hat over the trials and the times, if already computed.
+        It avoids a full pass on z_hat to compute the regularization.
     """
     n_channels = X.shape[1]
 
     if feasible_evaluation:
+        from .update_d_multi import is_feasible
+        feasible_evaluation = not is_feasible(
+            D_hat, uv_constraint=uv_constraint, n_channels=n_channels)
+
+    if feasible_evaluation:
+        # project to unit norm, without modifying the given D_hat
         if D_hat.ndim == 2:
-            D_hat = D_hat.copy()
-            # project to unit norm
             from .update_d_multi import prox_uv
             D_hat, norm = prox_uv(D_hat, uv_constraint=uv_constraint,
-                                  n_channels=n_channels, return_norm=True)
+                                  n_channels=n_channels, return_norm=True,
+                                  out=np.empty_like(D_hat))
+            if uv_constraint == 'joint':
+                # u and v are both divided by norm, so u v^T is divided by
+                # norm ** 2 while z is only multiplied by norm.
+                X_hat = None
         else:
-            D_hat = D_hat.copy()
-            # project to unit norm
             from .update_d_multi import prox_d
-            D_hat, norm = prox_d(D_hat, return_norm=True)
+            D_hat, norm = prox_d(D_hat, return_norm=True,
+                                 out=np.empty_like(D_hat))
 
-        # update z in the opposite way
-        z_hat = scale_z_by_atom(z_hat, scale=norm, copy=True)
+        # update z in the opposite way. The copy of z_hat is not needed if
+        # z_sum is given and the given X_hat is still valid after the
+        # projection, as X_hat is set to None above otherwise.
+        if z_sum is not None:
+            z_sum = z_sum * norm
+        if X_hat is None or z_sum is None:
+            z_hat = scale_z_by_atom(z_hat, scale=norm, copy=True)
 
-    X_hat = construct_X_multi(z_hat, D=D_hat, n_channels=n_channels)
+    if X_hat is None:
+        X_hat = construct_X_multi(z_hat, D=D_hat, n_channels=n_channels)
 
     cost = compute_objective(X=X, X_hat=X_hat, z_hat=z_hat, reg=reg, loss=loss,
-                             loss_params=loss_params)
+                             loss_params=loss_params, z_sum=z_sum)
     if return_X_hat:
         return cost, X_hat
     return cost
@@ -165,7 +199,7 @@ def gradient_uv(uv, X=None, z=None, constants=None, reg=None, loss='l2',
         The spatial and temporal atoms
     X : array, shape (n_trials, n_channels, n_times) or None
         The data array
-    z : array, shape (n_atoms, n_trials, n_times_valid) or None
+    z : array, shape (n_trials, n_atoms, n_times_valid) or None
         Can also be a list of n_trials LIL-sparse matrix of shape
             (n_atoms, n_times - n_times_atom + 1)
         The activations
@@ -226,7 +260,7 @@ def gradient_uv(uv, X=None, z=None, constants=None, reg=None, loss='l2',
             if isinstance(reg, float):
                 cost += reg * safe_sum(z)
             else:
-                cost += np.sum(reg * safe_sum(z, axis=(1, 2)))
+                cost += np.sum(np.ravel(reg) * safe_sum(z, axis=(0, 2)))
         return cost, grad
 
     return grad
@@ -256,7 +290,7 @@ def gradient_zi(Xi, zi, D=None, constants=None, reg=None, loss='l2',
             if isinstance(reg, float):
                 cost += reg * zi.sum()
             else:
-                cost += np.sum(reg * zi.sum(axis=1))
+                cost += np.sum(np.ravel(reg) * zi.sum(axis=1))
 
     if flatten:
         grad = grad.ravel()
@@ -280,7 +314,7 @@ def gradient_d(D=None, X=None, z=None, constants=None, reg=None,
         shape shape (n_atoms, n_channels + n_times_atom)
     X : array, shape (n_trials, n_channels, n_times) or None
         The data array
-    z : array, shape (n_atoms, n_trials, n_times_valid) or None
+    z : array, shape (n_trials, n_atoms, n_times_valid) or None
         The activations
     constants : dict or None
         Constant to accelerate the computation of the gradient
@@ -334,7 +368,7 @@ def gradient_d(D=None, X=None, z=None, constants=None, reg=None,
             if isinstance(reg, float):
                 cost += reg * safe_sum(z)
             else:
-                cost += np.dot(reg, safe_sum(z, axis=(1, 2)))
+                cost += np.dot(np.ravel(reg), safe_sum(z, axis=(0, 2)))
         return cost, grad_d
 
     return grad_d
@@ -424,10 +458,21 @@ def _l2_objective(X=None, X_hat=None, D=None, constants=None):
         cost += .5 * constants['XtX']
         return cost
 
-    # else, compute the l2 norm of the residual
+    # else, compute the l2 norm of the residual. It is computed by large
+    # blocks in a preallocated buffer, to avoid allocating a full residual
+    # array for long signals while keeping the number of calls small.
     assert X is not None and X_hat is not None
-    residual = X - X_hat
-    return 0.5 * np.dot(residual.ravel(), residual.ravel())
+    X, X_hat = X.ravel(), X_hat.ravel()
+    n_points = X.size
+    residual = np.empty(min(n_points, L2_BLOCK_SIZE),
+                        dtype=np.result_type(X, X_hat))
+    cost = 0
+    for start in range(0, n_points, L2_BLOCK_SIZE):
+        stop = min(start + L2_BLOCK_SIZE, n_points)
+        residual_block = residual[:stop - start]
+        np.subtract(X[start:stop], X_hat[start:stop], out=residual_block)
+        cost += np.dot(residual_block, residual_block)
+    return 0.5 * cost
 
 
 def _l2_gradient_zi(Xi, z_i, D=None, return_func=False):
@@ -77,7 +77,7 @@ class OnlineCDL(ConvolutionalDictionaryLearning):
         self.constants['ztX'] = alpha * self.constants['ztX'] + ztX
 
         # Make sure the activation is not all 0
-        z_nnz = np.sum(z_hat != 0, axis=(0, 2))
+        z_nnz = np.count_nonzero(z_hat, axis=(0, 2))
 
         if self.verbose > 5:
             print("[{}] sparsity: {:.3e}".format(
@@ -2,7 +2,7 @@ import pytest
 import numpy as np
 
 from alphacsc.utils import check_random_state
-from alphacsc.learn_d_z_multi import learn_d_z_multi
+from alphacsc.learn_d_z_multi import learn_d_z_multi, get_iteration_func
 from alphacsc.convolutional_dictionary_learning import BatchCDL, GreedyCDL
 from alphacsc.online_dictionary_learning import OnlineCDL
 from alphacsc.init_dict import init_dictionary
@@ -91,6 +91,41 @@ def test_online_learning():
     assert np.allclose(pobj_0, pobj_1)
 
 
+@pytest.mark.parametrize('algorithm', ['batch', 'greedy'])
+def test_d_change_tol(algorithm):
+    # skipping the objective evaluations should not change the iterates
+    n_trials, n_channels, n_times = 2, 3, 100
+    n_times_atom, n_atoms, n_iter = 10, 4, 30
+
+    rng = check_random_state(42)
+    X = rng.randn(n_trials, n_channels, n_times)
+    kwargs = dict(X=X, n_atoms=n_atoms, n_times_atom=n_times_atom, verbose=0,
+                  random_state=0, n_iter=n_iter, eps=-np.inf,
+                  solver_z='l-bfgs', algorithm=algorithm)
+    pobj_0, times_0, uv_hat_0, z_hat_0, _ = learn_d_z_multi(**kwargs)
+    pobj_1, times_1, uv_hat_1, z_hat_1, _ = learn_d_z_multi(
+        algorithm_params=dict(d_change_tol=1e-12), **kwargs)
+
+    assert np.allclose(uv_hat_0, uv_hat_1)
+    assert np.allclose(z_hat_0, z_hat_1)
+    assert len(pobj_1) == len(times_1)
+    assert len(pobj_1) < len(pobj_0)
+    assert np.isclose(pobj_0[-1], pobj_1[-1])
+
+
+def test_end_iteration_after_skip():
+    # an increase of the cost between pobj[-3] and pobj[-2] is only reported
+    # when pobj[-3] is the cost before the last z update
+    end_iteration = get_iteration_func(
+        eps=1e-10, stopping_pobj=None, callback=None, lmbd_max='fixed',
+        name='DL', verbose=0, raise_on_increase=True)
+    pobj = [10., 11., 10.5]
+    with pytest.raises(RuntimeError, match="z update have increased"):
+        end_iteration(None, None, None, pobj, 0)
+    assert not end_iteration(None, None, None, pobj, 0,
+                             check_decrease=False)
+
+
 @pytest.mark.parametrize('klass', [BatchCDL, OnlineCDL, GreedyCDL])
 def test_transformers(klass):
     # smoke test for transformer classes
@@ -7,7 +7,7 @@ from scipy.optimize import approx_fprime
 from alphacsc.utils import get_D
 from alphacsc.utils import construct_X_multi
 from alphacsc.utils.whitening import whitening
-from alphacsc.loss_and_gradient import gradient_d
+from alphacsc.loss_and_gradient import gradient_d, gradient_uv
 from alphacsc.loss_and_gradient import gradient_zi
 from alphacsc.loss_and_gradient import compute_X_and_objective_multi
 
@@ -149,3 +149,40 @@ def test_gradients(loss):
     gradient_checker(pobj, grad, n_atoms * n_times_valid, n_checks=n_checks,
                      debug=True, grad_name="gradient z for loss '{}'"
                      .format(loss), rtol=1e-4)
+
+
+def test_per_atom_reg():
+    n_trials, n_channels, n_times = 2, 3, 100
+    n_times_atom, n_atoms = 10, 4
+    n_times_valid = n_times - n_times_atom + 1
+
+    rng = np.random.RandomState(0)
+    X = rng.randn(n_trials, n_channels, n_times)
+    uv = rng.randn(n_atoms, n_channels + n_times_atom)
+    z = rng.rand(n_trials, n_atoms, n_times_valid)
+    # shape given by get_lambda_max for lmbd_max='per_atom'
+    reg = rng.rand(n_atoms, 1)
+
+    X_hat = construct_X_multi(z, uv, n_channels=n_channels)
+    cost_expected = 0.5 * np.sum((X - X_hat) ** 2)
+    cost_expected += np.sum(reg[None] * z)
+
+    cost = compute_X_and_objective_multi(X, z, uv, reg=reg,
+                                         feasible_evaluation=False)
+    assert np.isclose(cost, cost_expected)
+
+    # only the dtw gradients of the atoms return the cost, so the
+    # regularization is checked with this loss.
+    loss_params = dict(gamma=1, sakoe_chiba_band=n_times_atom // 2)
+    reg_expected = np.sum(reg[None] * z)
+    D = get_D(uv, n_channels)
+    for func, atoms in [(gradient_uv, uv), (gradient_d, D)]:
+        kwargs = dict(X=X, z=z, loss='dtw', loss_params=loss_params,
+                      return_func=True)
+        cost_reg, _ = func(atoms, reg=reg, **kwargs)
+        cost, _ = func(atoms, **kwargs)
+        assert np.isclose(cost_reg - cost, reg_expected)
+
+    cost_z = sum(gradient_zi(X_i, z_i, D=uv, reg=reg, return_func=True)[0]
+                 for X_i, z_i in zip(X, z))
+    assert np.isclose(cost_z, cost_expected)
@@ -5,6 +5,7 @@ from scipy import optimize, signal
 from alphacsc.loss_and_gradient import compute_objective
 from alphacsc.loss_and_gradient import gradient_d, gradient_uv
 from alphacsc.update_d_multi import update_uv, prox_uv, _get_d_update_constants
+from alphacsc.update_d_multi import prox_d, is_feasible
 from alphacsc.utils.whitening import whitening
 from alphacsc.utils import construct_X_multi
 
@@ -251,3 +252,73 @@ def test_constants_d():
             ztz[:, :, t0 - t] += tmp
 
     assert np.allclose(ztz, constants['ztz'])
+
+
+@pytest.mark.parametrize('uv_constraint', ['joint', 'separate'])
+def test_is_feasible(uv_constraint):
+    n_channels, n_times_atom, n_atoms = 5, 10, 2
+
+    rng = np.random.RandomState(0)
+    uv = rng.randn(n_atoms, n_channels + n_times_atom)
+    assert not is_feasible(uv, uv_constraint=uv_constraint,
+                           n_channels=n_channels)
+    uv = prox_uv(uv, uv_constraint=uv_constraint, n_channels=n_channels)
+    assert is_feasible(uv, uv_constraint=uv_constraint,
+                       n_channels=n_channels)
+
+    D = rng.randn(n_atoms, n_channels, n_times_atom)
+    assert not is_feasible(D)
+    assert is_feasible(prox_d(D))
+
+
+@pytest.mark.parametrize('uv_constraint', ['joint', 'separate'])
+def test_prox_uv_out(uv_constraint):
+    n_channels, n_times_atom, n_atoms = 5, 10, 2
+
+    rng = np.random.RandomState(0)
+    uv = rng.randn(n_atoms, n_channels + n_times_atom)
+    uv0 = uv.copy()
+
+    out = np.empty_like(uv)
+    uv_hat, norm = prox_uv(uv, uv_constraint=uv_constraint,
+                           n_channels=n_channels, return_norm=True, out=out)
+    assert uv_hat is out
+    assert np.all(uv == uv0)
+
+    uv_hat_inplace = prox_uv(uv, uv_constraint=uv_constraint,
+                             n_channels=n_channels)
+    assert np.allclose(uv_hat, uv_hat_inplace)
+
+    # read-only atoms, e.g. memory mapped, can be projected in out
+    uv_readonly = uv0.copy()
+    uv_readonly.flags.writeable = False
+    uv_hat_readonly = prox_uv(uv_readonly, uv_constraint=uv_constraint,
+                              n_channels=n_channels, out=np.empty_like(uv))
+    assert np.allclose(uv_hat, uv_hat_readonly)
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+@pytest.mark.parametrize('uv_constraint', ['joint', 'separate'])
+def test_prox_uv(uv_constraint, dtype):
+    n_channels, n_times_atom, n_atoms = 5, 10, 3
+
+    rng = np.random.RandomState(0)
+    uv = rng.randn(n_atoms, n_channels + n_times_atom)
+    # keep one atom already in the feasible set
+    uv[0] /= 10 * np.linalg.norm(uv[0])
+
+    if uv_constraint == 'joint':
+        norm_uv = np.maximum(1, np.linalg.norm(uv, axis=1))
+        uv_expected = uv / norm_uv[:, None]
+    else:
+        norm_u = np.maximum(1, np.linalg.norm(uv[:, :n_channels], axis=1))
+        norm_v = np.maximum(1, np.linalg.norm(uv[:, n_channels:], axis=1))
+        uv_expected = np.c_[uv[:, :n_channels] / norm_u[:, None],
+                            uv[:, n_channels:] / norm_v[:, None]]
+        norm_uv = norm_u * norm_v
+
+    uv_hat, norm = prox_uv(uv.astype(dtype), uv_constraint=uv_constraint,
+                           n_channels=n_channels, return_norm=True)
+    assert uv_hat.dtype == dtype
+    assert np.allclose(uv_hat, uv_expected, rtol=1e-5)
+    assert np.allclose(norm, norm_uv, rtol=1e-5)
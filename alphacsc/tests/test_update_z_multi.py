@@ -167,3 +167,51 @@ def test_n_jobs_larger_than_n_trials():
     uv = rng.randn(n_atoms, n_channels + n_times_atom)
 
     z_hat, ztz, ztX = update_z_multi(X, uv, 0.1, n_jobs=3)
+
+
+@pytest.mark.parametrize('uv_constraint', ['joint', 'separate'])
+@pytest.mark.parametrize('solver', ['l-bfgs', 'lgcd'])
+def test_update_z_multi_return_X_hat(solver, uv_constraint):
+    n_trials, n_channels, n_times = 2, 3, 100
+    n_times_atom, n_atoms = 10, 4
+
+    rng = np.random.RandomState(0)
+    X = rng.randn(n_trials, n_channels, n_times)
+    uv = rng.randn(n_atoms, n_channels + n_times_atom)
+
+    z_hat, _, _, X_hat = update_z_multi(X, uv, 0.1, solver=solver,
+                                        return_X_hat=True)
+    assert np.allclose(X_hat, construct_X_multi(z_hat, D=uv,
+                                                n_channels=n_channels))
+
+    loss_0 = compute_X_and_objective_multi(X, z_hat, D_hat=uv, reg=0.1,
+                                           uv_constraint=uv_constraint)
+    loss_1 = compute_X_and_objective_multi(X, z_hat, D_hat=uv, reg=0.1,
+                                           uv_constraint=uv_constraint,
+                                           X_hat=X_hat)
+    assert np.isclose(loss_0, loss_1)
+
+
+@pytest.mark.parametrize('uv_constraint', ['joint', 'separate'])
+@pytest.mark.parametrize('solver', ['l-bfgs', 'lgcd'])
+def test_update_z_multi_return_z_sum(solver, uv_constraint):
+    n_trials, n_channels, n_times = 2, 3, 100
+    n_times_atom, n_atoms = 10, 4
+
+    rng = np.random.RandomState(0)
+    X = rng.randn(n_trials, n_channels, n_times)
+    uv = rng.randn(n_atoms, n_channels + n_times_atom)
+    reg = 0.1
+
+    z_hat, _, _, X_hat, z_sum = update_z_multi(
+        X, uv, reg, solver=solver, return_X_hat=True, return_z_sum=True)
+    assert np.allclose(z_sum, z_hat.sum(axis=(0, 2)))
+
+    # also check a per atom regularization, as given by lmbd_max='per_atom'
+    for reg in [reg, rng.rand(n_atoms, 1)]:
+        loss_0 = compute_X_and_objective_multi(X, z_hat, D_hat=uv, reg=reg,
+                                               uv_constraint=uv_constraint)
+        loss_1 = compute_X_and_objective_multi(X, z_hat, D_hat=uv, reg=reg,
+                                               uv_constraint=uv_constraint,
+                                               X_hat=X_hat, z_sum=z_sum)
+        assert np.isclose(loss_0, loss_1)
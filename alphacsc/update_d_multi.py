@@ -4,6 +4,7 @@
 #          Alexandre Gramfort <alexandre.gramfort@inria.fr>
 #          Thomas Moreau <thomas.moreau@inria.fr>
 
+import numba
 import numpy as np
 
 from . import cython_code
@@ -22,38 +23,100 @@ def squeeze_all_except_one(X, axis=0):
     return X.squeeze(axis=squeeze_axis)
 
 
-def prox_uv(uv, uv_constraint='joint', n_channels=None, return_norm=False):
-    if uv_constraint == 'joint':
-        norm_uv = np.maximum(1, np.linalg.norm(uv, axis=1, keepdims=True))
-        uv /= norm_uv
+def prox_uv(uv, uv_constraint='joint', n_channels=None, return_norm=False,
+            out=None):
+    """Project uv on the feasible set
+
+    The projection is done in place, unless an output array out is given.
+    """
+    if out is None:
+        out = uv
 
+    if uv_constraint == 'joint':
+        # an empty u block projects the full atom at once
+        n_channels_u = 0
     elif uv_constraint == 'separate':
         assert n_channels is not None
-        norm_u = np.maximum(1, np.linalg.norm(uv[:, :n_channels],
-                                              axis=1, keepdims=True))
-        norm_v = np.maximum(1, np.linalg.norm(uv[:, n_channels:],
-                                              axis=1, keepdims=True))
-
-        uv[:, :n_channels] /= norm_u
-        uv[:, n_channels:] /= norm_v
-        norm_uv = norm_u * norm_v
+        n_channels_u = n_channels
     else:
         raise ValueError('Unknown uv_constraint: %s.' % (uv_constraint, ))
 
+    if (uv.dtype == np.float64 and out.dtype == np.float64 and
+            uv.flags.writeable):
+        norm_uv = _prox_uv(uv, n_channels_u, out)
+    else:
+        # the numba kernel is only compiled for writeable float64 arrays
+        norm_uv = np.ones(uv.shape[0])
+        for block in [slice(None, n_channels_u), slice(n_channels_u, None)]:
+            norm = np.maximum(1, np.linalg.norm(uv[:, block], axis=1,
+                                                keepdims=True))
+            np.divide(uv[:, block], norm, out=out[:, block])
+            norm_uv *= norm[:, 0]
+
     if return_norm:
-        return uv, squeeze_all_except_one(norm_uv, axis=0)
+        return out, norm_uv
     else:
-        return uv
+        return out
+
+
+@numba.jit((numba.float64[:, :], numba.int64, numba.float64[:, :]),
+           nopython=True, cache=True)
+def _prox_uv(uv, n_channels, out):  # pragma: no cover
+    """Project separately uv[:, :n_channels] and uv[:, n_channels:]
 
+    The norms and the scaling are computed in a single pass over each atom,
+    and the products of the norms of the two blocks are returned.
+    """
+    n_atoms, n_coefs = uv.shape
+    norm_uv = np.ones(n_atoms)
+    for k in range(n_atoms):
+        start = 0
+        for stop in (n_channels, n_coefs):
+            sq_norm = 0.
+            for i in range(start, stop):
+                sq_norm += uv[k, i] * uv[k, i]
+            norm = max(1., np.sqrt(sq_norm))
+            for i in range(start, stop):
+                out[k, i] = uv[k, i] / norm
+            norm_uv[k] *= norm
+            start = stop
+    return norm_uv
+
+
+def is_feasible(D, uv_constraint='joint', n_channels=None, tol=1e-12):
+    """Check if the atoms D are in the feasible set, i.e. norm(D) <= 1
+
+    In this case, prox_uv and prox_d do not change D.
+    """
+    if D.ndim == 3:
+        norm_d = np.linalg.norm(D, axis=(1, 2))
+    elif uv_constraint == 'joint':
+        norm_d = np.linalg.norm(D, axis=1)
+    elif uv_constraint == 'separate':
+        assert n_channels is not None
+        norm_d = np.r_[np.linalg.norm(D[:, :n_channels], axis=1),
+                       np.linalg.norm(D[:, n_channels:], axis=1)]
+    else:
+        raise ValueError('Unknown uv_constraint: %s.' % (uv_constraint, ))
+
+    return np.all(norm_d <= 1 + tol)
+
+
+def prox_d(D, return_norm=False, out=None):
+    """Project D on the feasible set
+
+    The projection is done in place, unless an output array out is given.
+    """
+    if out is None:
+        out = D
 
-def prox_d(D, return_norm=False):
     norm_d = np.maximum(1, np.linalg.norm(D, axis=(1, 2), keepdims=True))
-    D /= norm_d
+    np.divide(D, norm_d, out=out)
 
     if return_norm:
-        return D, squeeze_all_except_one(norm_d, axis=0)
+        return out, squeeze_all_except_one(norm_d, axis=0)
     else:
-        return D
+        return out
 
 
 def update_uv(X, z, uv_hat0, constants=None, b_hat_0=None, debug=False,
@@ -11,9 +11,10 @@ from joblib import Parallel, delayed
 
 
 from . import cython_code
-from .utils.optim import fista
+from .utils.optim import fista, positive_shrink
 from .utils import check_random_state
 from .loss_and_gradient import gradient_zi
+from .utils.convolution import _choose_convolve_multi
 from .utils.lil import is_list_of_lil, is_lil
 from .utils.coordinate_descent import _coordinate_descent_idx
 from .utils.compute_constants import compute_DtD, compute_ztz, compute_ztX
@@ -21,8 +22,8 @@ from .utils.compute_constants import compute_DtD, compute_ztz, compute_ztX
 
 def update_z_multi(X, D, reg, z0=None, solver='l-bfgs', solver_kwargs=dict(),
                    loss='l2', loss_params=dict(), freeze_support=False,
-                   return_ztz=False, timing=False, n_jobs=1,
-                   random_state=None, debug=False):
+                   return_ztz=False, return_X_hat=False, return_z_sum=False,
+                   timing=False, n_jobs=1, random_state=None, debug=False):
     """Update z using L-BFGS with positivity constraints
 
     Parameters
@@ -41,7 +42,9 @@ def update_z_multi(X, D, reg, z0=None, solver='l-bfgs', solver_kwargs=dict(),
     solver : 'l-bfgs' | "lgcd"
         The solver to use.
     solver_kwargs : dict
-        Parameters for the solver
+        Parameters for the solver. For 'fista', the momentum can be restarted
+        adaptively with restart='grad' and use a lazy-start with
+        lazy=(p, q, r), see alphacsc.utils.optim.fista.
     loss : 'l2' | 'dtw' | 'whitening'
         The data fit loss, either classical l2 norm or the soft-DTW loss.
     loss_params : dict
@@ -50,6 +53,12 @@ def update_z_multi(X, D, reg, z0=None, solver='l-bfgs', solver_kwargs=dict(),
         If True, the support of z0 is frozen.
     return_ztz : boolean
         If True, returns the constants ztz and ztX, used to compute D-updates.
+    return_X_hat : boolean
+        If True, also returns the reconstructed signal X_hat computed with the
+        final z, which can be reused to evaluate the objective.
+    return_z_sum : boolean
+        If True, also returns the sum of z over the trials and the times,
+        which can be reused to evaluate the regularization.
     timing : boolean
         If True, returns the cost function value at each iteration and the
         time taken by each iteration for each signal.
@@ -66,6 +75,15 @@ def update_z_multi(X, D, reg, z0=None, solver='l-bfgs', solver_kwargs=dict(),
     -------
     z : array, shape (n_trials, n_atoms, n_times - n_times_atom + 1)
         The true codes.
+    ztz : array, shape (n_atoms, n_atoms, 2 * n_times_atom - 1) or None
+        The constant ztz, if return_ztz is True and loss is 'l2'.
+    ztX : array, shape (n_atoms, n_channels, n_times_atom) or None
+        The constant ztX, if return_ztz is True and loss is 'l2'.
+    X_hat : array, shape (n_trials, n_channels, n_times)
+        The reconstructed signal. Only returned if return_X_hat is True.
+    z_sum : array, shape (n_atoms, )
+        The sum of z over the trials and the times. Only returned if
+        return_z_sum is True.
     """
     n_trials, n_channels, n_times = X.shape
     if D.ndim == 2:
@@ -88,8 +106,9 @@ def update_z_multi(X, D, reg, z0=None, solver='l-bfgs', solver_kwargs=dict(),
     results = Parallel(n_jobs=n_jobs)(
         delayed_update_z(X[i], D, reg, z0[i], debug, solver, solver_kwargs,
                          freeze_support, loss, loss_params=loss_params,
-                         return_ztz=return_ztz,
-                         timing=timing, random_state=seed)
+                         return_ztz=return_ztz, return_X_hat=return_X_hat,
+                         return_z_sum=return_z_sum, timing=timing,
+                         random_state=seed)
         for i, seed in enumerate(parallel_seeds))
 
     # Post process the results to get separate objects
@@ -99,17 +118,31 @@ def update_z_multi(X, D, reg, z0=None, solver='l-bfgs', solver_kwargs=dict(),
         ztX = np.zeros((n_atoms, n_channels, n_times_atom))
     else:
         ztz, ztX = None, None
-    for z_hat, ztz_i, ztX_i, pobj_i, times_i in results:
+    if return_X_hat:
+        X_hat = np.zeros((n_trials, n_channels, n_times))
+    if return_z_sum:
+        z_sum = np.zeros(n_atoms)
+    for i, (z_hat, ztz_i, ztX_i, X_hat_i, z_sum_i, pobj_i,
+            times_i) in enumerate(results):
         z_hats.append(z_hat), pobj.append(pobj_i), times.append(times_i)
         if loss == 'l2' and return_ztz:
             ztz += ztz_i
             ztX += ztX_i
+        if return_X_hat:
+            X_hat[i] = X_hat_i
+        if return_z_sum:
+            z_sum += z_sum_i
 
     # If z_hat is a ndarray, stack and reorder the columns
     if not is_list_of_lil(z0):
         z_hats = np.array(z_hats).reshape(n_trials, n_atoms, n_times_valid)
 
-    return z_hats, ztz, ztX
+    outputs = (z_hats, ztz, ztX)
+    if return_X_hat:
+        outputs += (X_hat, )
+    if return_z_sum:
+        outputs += (z_sum, )
+    return outputs
 
 
 class BoundGenerator(object):
@@ -133,7 +166,8 @@ class BoundGenerator(object):
 def _update_z_multi_idx(X_i, D, reg, z0_i, debug, solver='l-bfgs',
                         solver_kwargs=dict(), freeze_support=False, loss='l2',
                         loss_params=dict(), return_ztz=False,
-                        timing=False, random_state=None):
+                        return_X_hat=False, return_z_sum=False, timing=False,
+                        random_state=None):
     t_start = time.time()
     n_channels, n_times = X_i.shape
     if D.ndim == 2:
@@ -204,7 +238,8 @@ def _update_z_multi_idx(X_i, D, reg, z0_i, debug, solver='l-bfgs',
             return func_and_grad(z_hat)[1]
 
         def prox(z_hat, step_size=0):
-            return np.maximum(z_hat - step_size * reg, 0.)
+            # the point given by fista can be overwritten by its projection
+            return positive_shrink(z_hat, step_size * reg)
         z0_i = z0_i.ravel()
         output = fista(objective, grad, prox, step_size=None, x0=z0_i,
                        adaptive_step_size=True, timing=timing,
@@ -250,4 +285,14 @@ def _update_z_multi_idx(X_i, D, reg, z0_i, debug, solver='l-bfgs',
     else:
         ztz, ztX = None, None
 
-    return z_hat, ztz, ztX, pobj, times
+    # Reconstruct the signal in the parallel jobs to avoid recomputing it
+    # when evaluating the objective.
+    X_hat_i = None
+    if return_X_hat:
+        X_hat_i = _choose_convolve_multi(z_hat, D=D, n_channels=n_channels)
+
+    z_sum_i = None
+    if return_z_sum:
+        z_sum_i = np.asarray(z_hat.sum(axis=1)).ravel()
+
+    return z_hat, ztz, ztX, X_hat_i, z_sum_i, pobj, times
@@ -151,7 +151,7 @@ def _choose_convolve(z_i, ds):
     """
     assert z_i.shape[0] == ds.shape[0]
 
-    if np.sum(z_i != 0) < 0.01 * z_i.size:
+    if np.count_nonzero(z_i) < 0.01 * z_i.size:
         return _sparse_convolve(z_i, ds)
     else:
         return _dense_convolve(z_i, ds)
@@ -180,7 +180,7 @@ def _choose_convolve_multi(z_i, D=None, n_channels=None):
         else:
             return cython_code._fast_sparse_convolve_multi(z_i, D)
 
-    elif np.sum(z_i != 0) < 0.01 * z_i.size:
+    elif np.count_nonzero(z_i) < 0.01 * z_i.size:
         if D.ndim == 2:
             return _sparse_convolve_multi_uv(z_i, D, n_channels)
         else:
@@ -1,6 +1,8 @@
 # Authors: Thomas Moreau <thomas.moreau@inria.fr>
 
 import time
+
+import numba
 import numpy as np
 from scipy import sparse
 
@@ -81,6 +83,11 @@ def _coordinate_descent_idx(Xi, D, constants, reg, z0=None, max_iter=1000,
 
     DtD = constants["DtD"]
     norm_Dk = np.array([DtD[k, k, t0] for k in range(n_atoms)])[:, None]
+    # per atom regularization, used by the compiled updates
+    reg_k = np.ones(n_atoms) * np.ravel(reg)
+    if is_lil(z_hat) and np.size(reg) > 1:
+        raise NotImplementedError("Per atom regularization is not "
+                                  "implemented for lil matrices.")
 
     if timing:
         times = [time.time() - t_start]
@@ -124,7 +131,7 @@ def _coordinate_descent_idx(Xi, D, constants, reg, z0=None, max_iter=1000,
             # update beta
             beta, dz_opt, accumulator, active_segs = _update_beta(
                 beta, dz_opt, accumulator, active_segs, z_hat, DtD, norm_Dk,
-                dz, k0, t0, reg, tol, seg_bounds, i_seg, n_times_atom, z0,
+                dz, k0, t0, reg_k, tol, seg_bounds, i_seg, n_times_atom, z0,
                 freeze_support, debug)
 
         elif active_segs[i_seg]:
@@ -205,23 +212,24 @@ def _update_beta(beta, dz_opt, accumulator, active_segs, z_hat, DtD, norm_Dk,
     # define the bounds for the beta update
     t_start_up = max(0, t0 - n_times_atom + 1)
     t_end_up = min(t0 + n_times_atom, n_times_valid)
-
-    # update beta
-    beta_i0 = beta[k0, t0]
-    ll = t_end_up - t_start_up
     offset = max(0, n_times_atom - t0 - 1)
-    beta[:, t_start_up:t_end_up] += DtD[:, k0, offset:offset + ll] * dz
-    beta[k0, t0] = beta_i0
 
-    # update dz_opt
     if is_lil(z_hat):
+        # update beta
+        beta_i0 = beta[k0, t0]
+        ll = t_end_up - t_start_up
+        beta[:, t_start_up:t_end_up] += DtD[:, k0, offset:offset + ll] * dz
+        beta[k0, t0] = beta_i0
+
+        # update dz_opt
         cython_code._assert_cython()
         cython_code.update_dz_opt(
-            z_hat, beta, dz_opt, norm_Dk[:, 0], reg, t_start_up, t_end_up)
+            z_hat, beta, dz_opt, norm_Dk[:, 0], reg[0], t_start_up, t_end_up)
+        dz_opt[k0, t0] = 0
     else:
-        tmp = np.maximum(-beta[:, t_start_up:t_end_up] - reg, 0) / norm_Dk
-        dz_opt[:, t_start_up:t_end_up] = tmp - z_hat[:, t_start_up:t_end_up]
-    dz_opt[k0, t0] = 0
+        # update beta and dz_opt in a single compiled pass
+        _update_beta_and_dz_opt(beta, dz_opt, z_hat, DtD, norm_Dk[:, 0], reg,
+                                dz, k0, t0, t_start_up, t_end_up, offset)
 
     # reunable greedy updates in the segments immediately before or after
     # if beta was update outside the segment
@@ -273,10 +281,8 @@ def _select_coordinate(strategy, dz_opt, active_seg, n_atoms, n_times_valid,
         # if dZs[i_seg] > tol:
         t_start_seg, t_end_seg = seg_bounds
         if active_seg:
-            i0 = abs(dz_opt[:, t_start_seg:t_end_seg]).argmax()
-            n_times_current = min(n_times_seg, n_times_valid - t_start_seg)
-            k0, t0 = np.unravel_index(i0, (n_atoms, n_times_current))
-            t0 += t_start_seg
+            k0, t0 = _argmax_abs_segment(
+                dz_opt, t_start_seg, min(t_end_seg, n_times_valid))
             dz = dz_opt[k0, t0]
         else:
             k0, t0, dz = None, None, 0
@@ -285,3 +291,38 @@ def _select_coordinate(strategy, dz_opt, active_seg, n_atoms, n_times_valid,
                          "{'greedy' | 'random' | 'cyclic'}. Got '%s'."
                          % (strategy, ))
     return k0, t0, dz
+
+
+@numba.jit((numba.float64[:, :], numba.float64[:, :], numba.float64[:, :],
+            numba.float64[:, :, :], numba.float64[:], numba.float64[:],
+            numba.float64, numba.int64, numba.int64, numba.int64,
+            numba.int64, numba.int64), nopython=True, cache=True)
+def _update_beta_and_dz_opt(beta, dz_opt, z_hat, DtD, norm_Dk, reg, dz, k0,
+                            t0, t_start_up, t_end_up,
+                            offset):  # pragma: no cover
+    """Update beta and dz_opt on the segment t_start_up:t_end_up after the
+    coordinate (k0, t0) of z_hat has been updated by dz."""
+    n_atoms = beta.shape[0]
+    for k in range(n_atoms):
+        for t in range(t_start_up, t_end_up):
+            if k != k0 or t != t0:
+                beta[k, t] += DtD[k, k0, offset + t - t_start_up] * dz
+            dz_opt[k, t] = max(-beta[k, t] - reg[k], 0) / norm_Dk[k]
+            dz_opt[k, t] -= z_hat[k, t]
+    dz_opt[k0, t0] = 0
+
+
+@numba.jit((numba.float64[:, :], numba.int64, numba.int64), nopython=True,
+           cache=True)
+def _argmax_abs_segment(dz_opt, t_start, t_end):  # pragma: no cover
+    """Return the coordinate (k0, t0) of the largest abs(dz_opt) on the
+    segment t_start:t_end."""
+    n_atoms = dz_opt.shape[0]
+    k0, t0 = 0, t_start
+    adz = -1.
+    for k in range(n_atoms):
+        for t in range(t_start, t_end):
+            if abs(dz_opt[k, t]) > adz:
+                k0, t0 = k, t
+                adz = abs(dz_opt[k, t])
+    return k0, t0
@@ -50,7 +50,7 @@ def get_nnz_and_size(z_hat):
                          ).sum(axis=0)
         z_size = len(z_hat) * np.prod(z_hat[0].shape)
     else:
-        z_nnz = np.sum(z_hat != 0, axis=(0, 2))
+        z_nnz = np.count_nonzero(z_hat, axis=(0, 2))
         z_size = z_hat.size
     return z_nnz, z_size
 
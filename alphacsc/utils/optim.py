@@ -1,5 +1,6 @@
 import time
 
+import numba
 import numpy as np
 from scipy import optimize
 
@@ -13,7 +14,7 @@ MIN_STEP_SIZE = 1e-20
 def _support_least_square(X, uv, z, debug=False):
     """WIP, not fonctional!"""
     n_trials, n_channels, n_times = X.shape
-    n_atoms, _, n_times_valid = z.shape
+    _, n_atoms, n_times_valid = z.shape
     n_times_atom = n_times - n_times_valid + 1
 
     # Compute DtD
@@ -23,7 +24,7 @@ def _support_least_square(X, uv, z, debug=False):
 
     for idx in range(n_trials):
         Xi = X[idx]
-        support_i = z[:, idx].nonzero()
+        support_i = z[idx].nonzero()
         n_support = len(support_i[0])
         if n_support == 0:
             continue
@@ -41,14 +42,15 @@ def _support_least_square(X, uv, z, debug=False):
         # Solve the non-negative least-square with nnls
         z_star, a = optimize.nnls(rhs, lhs)
         for i, (k_i, t_i) in enumerate(zip(*support_i)):
-            z_hat[k_i, idx, t_i] = z_star[i]
+            z_hat[idx, k_i, t_i] = z_star[i]
 
     return z_hat
 
 
 def fista(f_obj, f_grad, f_prox, step_size, x0, max_iter, verbose=0,
           momentum=False, eps=None, adaptive_step_size=False, debug=False,
-          scipy_line_search=True, name='ISTA', timing=False):
+          scipy_line_search=True, name='ISTA', timing=False, restart=None,
+          lazy=None):
     """Proximal Gradient Descent (PGD) and Accelerated PDG.
 
     This reduces to ISTA and FISTA when the loss function is the l2 loss and
@@ -82,6 +84,14 @@ def fista(f_obj, f_grad, f_prox, step_size, x0, max_iter, verbose=0,
     timing : boolean
         If True, compute the objective function at each step, and the duration
         of each step, and return both lists at the end.
+    restart : None | 'grad'
+        Adaptive restart of the momentum for FISTA. If 'grad', the momentum
+        is reset when it goes in a direction opposite to the gradient step,
+        i.e. when <y_k - x_{k+1}, x_{k+1} - x_k> > 0.
+    lazy : None | tuple (p, q, r)
+        Parameters of the lazy-start FISTA, which updates the momentum with
+        t_{k+1} = (p + sqrt(q + r t_k^2)) / 2. None corresponds to the
+        classical FISTA, i.e. (1, 1, 4).
 
     Returns
     -------
@@ -104,11 +114,17 @@ def fista(f_obj, f_grad, f_prox, step_size, x0, max_iter, verbose=0,
     if eps is None:
         eps = np.finfo(np.float32).eps
 
+    if restart not in (None, 'grad'):
+        raise ValueError("Unknown restart strategy: %s." % (restart, ))
+    p, q, r = (1, 1, 4) if lazy is None else lazy
+
     tk = 1.0
     x_hat = x0.copy()
     x_hat_aux = x_hat.copy()
     grad = np.empty(x_hat.shape)
     diff = np.empty(x_hat.shape)
+    if momentum and restart == 'grad':
+        x_hat_prev_aux = np.empty(x_hat.shape)
     last_up = t_start = time.time()
     for ii in range(max_iter):
         t_update = time.time()
@@ -119,6 +135,8 @@ def fista(f_obj, f_grad, f_prox, step_size, x0, max_iter, verbose=0,
         has_restarted = False
 
         grad[:] = f_grad(x_hat_aux)
+        if momentum and restart == 'grad':
+            x_hat_prev_aux[:] = x_hat_aux
 
         if adaptive_step_size:
 
@@ -153,6 +171,8 @@ def fista(f_obj, f_grad, f_prox, step_size, x0, max_iter, verbose=0,
                 x_hat_aux = x_hat
                 has_restarted = momentum
                 step_size = 1.
+                if restart is not None:
+                    tk = 1.0
 
         else:
             x_hat_aux -= step_size * grad
@@ -161,7 +181,12 @@ def fista(f_obj, f_grad, f_prox, step_size, x0, max_iter, verbose=0,
         diff[:] = x_hat_aux - x_hat
         x_hat[:] = x_hat_aux
         if momentum:
-            tk_new = (1 + np.sqrt(1 + 4 * tk * tk)) / 2
+            if restart == 'grad':
+                x_hat_prev_aux -= x_hat
+                if np.dot(x_hat_prev_aux.ravel(), diff.ravel()) > 0:
+                    # restart the momentum
+                    tk = 1.0
+            tk_new = (p + np.sqrt(q + r * tk * tk)) / 2
             x_hat_aux += (tk - 1) / tk_new * diff
             tk = tk_new
 
@@ -189,6 +214,14 @@ def fista(f_obj, f_grad, f_prox, step_size, x0, max_iter, verbose=0,
     return x_hat, pobj
 
 
+@numba.jit((numba.float64[:], numba.float64), nopython=True, cache=True)
+def positive_shrink(x, threshold):  # pragma: no cover
+    """Non-negative soft-thresholding max(x - threshold, 0), done in place"""
+    for i in range(x.shape[0]):
+        x[i] = max(x[i] - threshold, 0.)
+    return x
+
+
 def _adaptive_step_size(f, f0=None, alpha=None, tau=2):
     """
     Parameters
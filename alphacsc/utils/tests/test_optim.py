@@ -1,6 +1,7 @@
+import pytest
 import numpy as np
 
-from alphacsc.utils.optim import fista, power_iteration
+from alphacsc.utils.optim import fista, power_iteration, positive_shrink
 
 
 def test_ista():
@@ -32,9 +33,84 @@ def test_ista():
     assert np.all(np.diff(pobj) <= 0)
 
 
+@pytest.mark.parametrize('lazy', [None, (1 / 20., 1, 4)])
+def test_fista_restart(lazy):
+    """Test that FISTA with adaptive restart converges on a simple problem."""
+    rng = np.random.RandomState(0)
+    n, p = 100, 10
+    x = rng.randn(p)
+    x /= np.linalg.norm(x)
+    A = rng.randn(n, p)
+    b = np.dot(A, x)
+
+    def obj(x):
+        res = A.dot(x) - b
+        return 0.5 * np.dot(res.ravel(), res.ravel())
+
+    def grad(x):
+        return A.T.dot(A.dot(x) - b)
+
+    def prox(x, step_size=0):
+        return x / max(np.linalg.norm(x), 1.)
+
+    x0 = rng.rand(p)
+    L = power_iteration(A.dot(A.T))
+    step_size = 0.99 / L
+    x_hat, pobj = fista(obj, grad, prox, step_size, x0, max_iter=600,
+                        momentum=True, eps=None, debug=True, verbose=0,
+                        restart='grad', lazy=lazy)
+    np.testing.assert_array_almost_equal(x, x_hat)
+
+
+def test_fista_restart_strongly_convex():
+    """Test that the restart and the lazy-start change the momentum.
+
+    On a strongly convex problem, the classical FISTA oscillates and both
+    variants converge much faster.
+    """
+    rng = np.random.RandomState(0)
+    n, p = 100, 20
+    U, _ = np.linalg.qr(rng.randn(n, p))
+    A = U * np.logspace(0, -1, p)
+    x = rng.randn(p)
+    b = np.dot(A, x)
+
+    def obj(x):
+        res = A.dot(x) - b
+        return 0.5 * np.dot(res, res)
+
+    def grad(x):
+        return A.T.dot(A.dot(x) - b)
+
+    def prox(x, step_size=0):
+        return x
+
+    step_size = 1. / power_iteration(A.T.dot(A))
+    kwargs = dict(max_iter=300, momentum=True, eps=0, debug=True)
+
+    _, pobj = fista(obj, grad, prox, step_size, np.zeros(p), **kwargs)
+    _, pobj_restart = fista(obj, grad, prox, step_size, np.zeros(p),
+                            restart='grad', **kwargs)
+    _, pobj_lazy = fista(obj, grad, prox, step_size, np.zeros(p),
+                         lazy=(1 / 20., 1, 4), **kwargs)
+
+    assert pobj_restart[-1] < 1e-6 * pobj[-1]
+    assert pobj_lazy[-1] < 1e-6 * pobj[-1]
+
+
 def test_power_iterations():
     """Test power iteration."""
     A = np.diag((1, 2, 3))
     mu, b = np.linalg.eig(A)
     mu_hat = power_iteration(A)
     assert np.isclose(mu_hat, mu.max())
+
+
+def test_positive_shrink():
+    rng = np.random.RandomState(0)
+    x = rng.randn(100)
+
+    x_expected = np.maximum(x - .5, 0)
+    x_hat = positive_shrink(x, .5)
+    assert np.shares_memory(x_hat, x)
+    assert np.allclose(x_hat, x_expected)
@@ -0,0 +1,99 @@
+import pytest
+import numpy as np
+
+from alphacsc.utils.whitening import whitening, apply_whitening
+from alphacsc.utils.whitening import _fir_filter, FFT_MIN_KERNEL_SIZE
+
+
+def _apply_ar_1d(ar_coef, x, zero_phase, mode):
+    # reference implementation, filtering one signal at a time
+    if zero_phase:
+        tmp = np.convolve(x, ar_coef, mode)[::-1]
+        return np.convolve(tmp, ar_coef, mode)[::-1]
+    return np.convolve(x, ar_coef, mode)
+
+
+@pytest.mark.parametrize('mode', ['same', 'valid', 'full'])
+@pytest.mark.parametrize('zero_phase', [True, False])
+@pytest.mark.parametrize('reverse_ar', [True, False])
+def test_apply_whitening(mode, zero_phase, reverse_ar):
+    n_trials, n_channels, n_times = 3, 4, 200
+
+    rng = np.random.RandomState(0)
+    X = rng.randn(n_trials, n_channels, n_times)
+    ar_model, _ = whitening(X, ordar=10)
+
+    ar_coef = np.concatenate((np.ones(1), ar_model.AR_))
+    if reverse_ar:
+        ar_coef = ar_coef[::-1]
+    X_white = np.array([[_apply_ar_1d(ar_coef, X_ij, zero_phase, mode)
+                         for X_ij in X_i] for X_i in X])
+
+    X_white_batch = apply_whitening(ar_model, X, zero_phase=zero_phase,
+                                    mode=mode, reverse_ar=reverse_ar)
+    assert X_white_batch.shape == X_white.shape
+    if zero_phase and mode == 'same':
+        # the single pass zero-phase filtering only differs on the edges
+        n_times_ar = len(ar_coef)
+        X_white = X_white[..., n_times_ar:-n_times_ar]
+        X_white_batch = X_white_batch[..., n_times_ar:-n_times_ar]
+    assert np.allclose(X_white_batch, X_white)
+
+
+@pytest.mark.parametrize('mode', ['same', 'valid', 'full'])
+@pytest.mark.parametrize('n_times_kernel', [5, FFT_MIN_KERNEL_SIZE + 1])
+def test_fir_filter(mode, n_times_kernel):
+    rng = np.random.RandomState(0)
+    x = rng.randn(3, 4, 100)
+    kernel = rng.randn(n_times_kernel)
+
+    x_conv = np.array([[np.convolve(x_ij, kernel, mode) for x_ij in x_i]
+                       for x_i in x])
+    assert np.allclose(_fir_filter(x, kernel, mode), x_conv)
+
+
+@pytest.mark.parametrize('mode', ['same', 'valid', 'full'])
+def test_apply_whitening_uv(mode):
+    n_trials, n_channels, n_times = 3, 4, 200
+    n_atoms, n_times_atom = 2, 30
+
+    rng = np.random.RandomState(0)
+    X = rng.randn(n_trials, n_channels, n_times)
+    ar_model, _ = whitening(X, ordar=10)
+
+    uv = rng.randn(n_atoms, n_channels + n_times_atom)
+    uv_white = apply_whitening(ar_model, uv, zero_phase=False, mode=mode,
+                               n_channels=n_channels)
+
+    ar_coef = np.concatenate((np.ones(1), ar_model.AR_))
+    v_white = np.array([_apply_ar_1d(ar_coef, v_k, False, mode)
+                        for v_k in uv[:, n_channels:]])
+    assert np.all(uv_white[:, :n_channels] == uv[:, :n_channels])
+    assert np.allclose(uv_white[:, n_channels:], v_white)
+
+    # single precision atoms stay in single precision
+    uv_white_32 = apply_whitening(ar_model, uv.astype(np.float32),
+                                  zero_phase=False, mode=mode,
+                                  n_channels=n_channels)
+    assert uv_white_32.dtype == np.float32
+    assert np.allclose(uv_white_32, uv_white, atol=1e-5)
+
+
+def test_whitening_float32():
+    n_trials, n_channels, n_times = 3, 4, 500
+
+    rng = np.random.RandomState(0)
+    X = rng.randn(n_trials, n_channels, n_times)
+
+    ar_model, X_white = whitening(X)
+    ar_model_32, X_white_32 = whitening(X, dtype=np.float32)
+    assert X_white.dtype == np.float64
+    assert X_white_32.dtype == np.float32
+    assert np.allclose(ar_model_32.AR_, ar_model.AR_, rtol=1e-4)
+    assert np.allclose(X_white_32, X_white, atol=1e-5)
+
+    for n_times_kernel in [5, FFT_MIN_KERNEL_SIZE + 1]:
+        kernel = rng.randn(n_times_kernel)
+        x_conv = _fir_filter(X.astype(np.float32), kernel)
+        assert x_conv.dtype == np.float32
+        assert np.allclose(x_conv, _fir_filter(X, kernel), atol=1e-5)
@@ -1,15 +1,39 @@
+from functools import lru_cache
+
 import numpy as np
 from scipy import signal
 
 from .arma import Arma
 
+try:
+    from scipy.fft import rfft, irfft, next_fast_len
+    # use all the cores in pocketfft
+    FFT_KWARGS = dict(workers=-1)
+except ImportError:  # pragma: no cover
+    # scipy < 1.4, fall back on the single-threaded numpy FFT
+    from numpy.fft import rfft, irfft
+    from scipy.fftpack import next_fast_len
+    FFT_KWARGS = dict()
+
+# Kernel size above which the filtering is done with the FFT
+FFT_MIN_KERNEL_SIZE = 32
+
 
 def whitening(X, ordar=10, block_length=256, sfreq=1., zero_phase=True,
-              plot=False, use_fooof=False):
+              plot=False, use_fooof=False, dtype=None):
+    """Estimate an AR model on X and whiten the signals with it
+
+    dtype is the precision of the whitened signals, e.g. np.float32 to halve
+    the memory and the cost of the filtering. If None, the dtype of X is kept.
+    """
     n_trials, n_channels, n_times = X.shape
 
+    # make sure that reshaping X gives a view and not a copy, and cast X once
+    X = np.ascontiguousarray(X, dtype=dtype)
+    X_2d = X.reshape(-1, n_times)
+
     ar_model = Arma(ordar=ordar, ordma=0, fs=sfreq, block_length=block_length)
-    ar_model.periodogram(X.reshape(-1, n_times), hold=False, mean_psd=True)
+    ar_model.periodogram(X_2d, hold=False, mean_psd=True)
 
     if use_fooof:  # pragma: no cover
         # Fit the psd with a 1/f^a background model plus a gaussian mixture.
@@ -35,8 +59,8 @@ def whitening(X, ordar=10, block_length=256, sfreq=1., zero_phase=True,
 
     # removes edges
     n_times_white = X_white.shape[-1]
-    X_white *= signal.tukey(n_times_white,
-                            alpha=3 / float(n_times_white))[None, None, :]
+    X_white *= _tukey_window(n_times_white,
+                             alpha=3 / float(n_times_white))[None, None, :]
 
     if plot:  # pragma: no cover
         import matplotlib.pyplot as plt
@@ -57,34 +81,87 @@ def whitening(X, ordar=10, block_length=256, sfreq=1., zero_phase=True,
     return ar_model, X_white
 
 
-def apply_ar(ar_model, x, zero_phase=True, mode='same', reverse_ar=False):
-    # TODO: speed-up with only one conv
-    ar_coef = np.concatenate((np.ones(1), ar_model.AR_))
-    if reverse_ar:
-        ar_coef = ar_coef[::-1]
+@lru_cache(maxsize=8)
+def _tukey_window(n_times, alpha):
+    """Cached tukey window, returned as a read-only array"""
+    window = signal.tukey(n_times, alpha=alpha)
+    window.flags.writeable = False
+    return window
 
+
+def apply_ar(ar_coef, x, zero_phase=True, mode='same'):
+    """Apply the AR filter with coefficients ar_coef along the last axis of x
+
+    x can have any number of dimensions, all the signals x[..., :] are
+    filtered jointly.
+    """
     if zero_phase:
-        tmp = signal.fftconvolve(x, ar_coef, mode)[::-1]
-        return signal.fftconvolve(tmp, ar_coef, mode)[::-1]
+        # Filtering forward and backward is equivalent to filtering once with
+        # the autocorrelation of the AR coefficients. With mode='same', this
+        # only differs on the edges as the intermediate signal is not cropped.
+        ar_coef = np.convolve(ar_coef, ar_coef[::-1])
+
+    return _fir_filter(x, ar_coef, mode)
+
+
+def _fir_filter(x, kernel, mode='same'):
+    """Convolve x with a kernel along the last axis
+
+    This gives the same result as np.convolve(x_i, kernel, mode) for each
+    signal x_i in x. Short kernels use a direct FIR filtering with lfilter,
+    which is faster than the FFT for them. Longer kernels use a multi-threaded
+    FFT with a fast length for the transform. float32 signals are filtered in
+    single precision.
+    """
+    dtype = np.result_type(x.dtype, np.float32)
+    kernel = np.asarray(kernel, dtype=dtype)
+
+    n_times = x.shape[-1]
+    n_times_kernel = len(kernel)
+    if mode == 'full':
+        n_pad, start = n_times_kernel - 1, 0
+    elif mode == 'same':
+        n_pad = start = (n_times_kernel - 1) // 2
+    elif mode == 'valid':
+        n_pad, start = 0, n_times_kernel - 1
+    else:
+        raise ValueError("Unknown mode: %s." % (mode, ))
+    n_times_out = n_times + n_pad - start
+
+    if n_times_kernel > FFT_MIN_KERNEL_SIZE:
+        n_fft = next_fast_len(n_times + n_times_kernel - 1)
+        x_fft = rfft(x, n=n_fft, axis=-1, **FFT_KWARGS)
+        x_fft *= rfft(kernel, n=n_fft)
+        x_conv = irfft(x_fft, n=n_fft, axis=-1, **FFT_KWARGS)
     else:
-        return signal.fftconvolve(x, ar_coef, mode)
+        if n_pad > 0:
+            pad_width = [(0, 0)] * (x.ndim - 1) + [(0, n_pad)]
+            x = np.pad(x, pad_width, mode='constant')
+        x_conv = signal.lfilter(kernel, np.ones(1, dtype=dtype), x, axis=-1)
+    return x_conv[..., start:start + n_times_out]
 
 
 def apply_whitening(ar_model, X, zero_phase=True, mode='same',
                     reverse_ar=False, n_channels=None):
+    # build the filter once for all the signals in X
+    ar_coef = np.concatenate((np.ones(1), ar_model.AR_))
+
     if X.ndim == 2:
         msg = "For rank1 D, n_channels should be provided"
         assert n_channels is not None, msg
         v = X[:, n_channels:]
-        v_white = [apply_ar(ar_model, vk, zero_phase=zero_phase,
-                            mode=mode) for vk in v]
-        return np.c_[X[:, :n_channels], v_white]
+        v_white = apply_ar(ar_coef, v, zero_phase=zero_phase, mode=mode)
+
+        X_white = np.empty((X.shape[0], n_channels + v_white.shape[1]),
+                           dtype=np.result_type(X, v_white))
+        X_white[:, :n_channels] = X[:, :n_channels]
+        X_white[:, n_channels:] = v_white
+        return X_white
 
     elif X.ndim == 3:
-        return np.array([[
-            apply_ar(ar_model, Xij, zero_phase=zero_phase, mode=mode,
-                     reverse_ar=reverse_ar) for Xij in Xi]
-            for Xi in X])
+        if reverse_ar:
+            ar_coef = ar_coef[::-1]
+        return apply_ar(ar_coef, X, zero_phase=zero_phase, mode=mode)
     else:
         raise NotImplementedError("Should not be called!")
 